@@ -4,19 +4,33 @@ from omegaconf import DictConfig
 from product_scraper_poc.scraper import scrape_all_categories, save_to_excel_multiple_sheets
 from loguru import logger
 
-@hydra.main(config_path="config", config_name="config", version_base=None)
-def main(cfg: DictConfig):
-    logger.info("Starting the product scraping process...")
+try:
+    import uvloop
+except ImportError:
+    # uvloop is not available on Windows, fall back to the default asyncio event loop
+    uvloop = None
 
-    loop = asyncio.get_event_loop()
+"""Scrape all product categories and save them to the Excel output file"""
+async def scrape_and_save(cfg: DictConfig):
     # Scraping all product categories and their product data asynchronously
-    category_data = loop.run_until_complete(scrape_all_categories(cfg.scraper.base_url, cfg.scraper.selectors))
+    category_data = await scrape_all_categories(
+        cfg.scraper.base_url, cfg.scraper.selectors, cfg.scraper.rate_limit, cfg.scraper.product_cache_file
+    )
 
     if category_data:
-        save_to_excel_multiple_sheets(category_data, cfg.scraper.output_file) 
+        await save_to_excel_multiple_sheets(category_data, cfg.scraper.output_file, cfg.scraper.excel_engine) 
     else:
         logger.error("No data scraped. Exiting the process.")
 
+@hydra.main(config_path="config", config_name="config", version_base=None)
+def main(cfg: DictConfig):
+    logger.info("Starting the product scraping process...")
+
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    asyncio.run(scrape_and_save(cfg))
+
 if __name__ == "__main__":
     main()
 
@@ -1,42 +1,181 @@
 import aiohttp
 import asyncio
-from bs4 import BeautifulSoup
+from functools import lru_cache
+from aiolimiter import AsyncLimiter
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.dammit import EncodingDetector
+import soupsieve as sv
 import pandas as pd
+import openpyxl
+from openpyxl.utils.dataframe import dataframe_to_rows
+from pyexcelerate import Workbook
+import xlsxwriter
 from loguru import logger
+from product_scraper_poc.utils import ProductCache
 import os
-
+import random
+import re
+import time
+from urllib.parse import urljoin, urlparse
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# Connection pool and concurrency limits shared by every category scrape
+MAX_CONNECTIONS = 256
+MAX_CONNECTIONS_PER_HOST = 64
+
+# Product detail workers shared by all categories and how many listed products may wait for them
+DETAIL_WORKERS = 64
+PRODUCT_QUEUE_SIZE = 256
+
+# Number of listing pages fetched concurrently when page URLs are numbered
+PAGINATION_WINDOW = 4
+PAGE_NUMBER_PATTERN = re.compile(r'([?&](?:p|page)=)(\d+)')
+SELECTOR_CLASS_PATTERN = re.compile(r'\.([\w-]+)')
+
+
+"""Build a SoupStrainer class matcher that accepts any element carrying one of the classes
+    While parsing, bs4 hands the strainer the whole class attribute ("table table-bordered mt-3"),
+    so a plain class_ string would only match elements with exactly that one class"""
+def has_any_class(*classes: str):
+    wanted = set(classes)
+    return lambda value: bool(value) and not wanted.isdisjoint(value.split())
+
+# Rows of the product details table, selected in a single query
+PRODUCT_TABLE_ROW_SELECTOR = 'table.table.table-bordered.mt-3 tr'
+# Only the product details table is materialised when parsing product pages with BeautifulSoup
+PRODUCT_TABLE_STRAINER = SoupStrainer('table', attrs={'class': has_any_class('table-bordered')})
+
+# Retry and rate limiting settings for request_page
+MAX_RETRIES = 5
+MAX_BACKOFF_SECONDS = 30
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Per-host request rate (max requests per period in seconds), set from the scraper.rate_limit config
+rate_limit = {'requests': 20, 'period': 1}
+# One rate limiter per host, created lazily by get_host_limiter
+host_limiters = {}
+
+
+"""Set the per-host request rate used by request_page
+    Limiters created with the previous rate are dropped"""
+def set_rate_limit(requests: float, period: float):
+    rate_limit['requests'] = requests
+    rate_limit['period'] = period
+    host_limiters.clear()
+
+"""Get the rate limiter for the host of the given URL"""
+def get_host_limiter(url: str) -> AsyncLimiter:
+    host = urlparse(url).netloc
+    if host not in host_limiters:
+        host_limiters[host] = AsyncLimiter(rate_limit['requests'], rate_limit['period'])
+    return host_limiters[host]
+
+"""Work out how long to wait before retrying a request
+    Honours Retry-After / X-RateLimit-Reset headers when present, otherwise backs off exponentially with jitter"""
+def get_retry_delay(headers, attempt: int) -> float:
+    retry_after = headers.get('Retry-After') if headers else None
+    rate_limit_reset = headers.get('X-RateLimit-Reset') if headers else None
+
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), MAX_BACKOFF_SECONDS)
+    if rate_limit_reset and rate_limit_reset.isdigit():
+        reset = float(rate_limit_reset)
+        # The reset header is either an epoch timestamp or a number of seconds
+        if reset > time.time():
+            reset -= time.time()
+        return min(reset, MAX_BACKOFF_SECONDS)
+
+    return min(2 ** attempt, MAX_BACKOFF_SECONDS) + random.uniform(0, 1)
+
+"""Decode a page body with the charset from the Content-Type header
+    Falls back to the <meta charset> declared in the page, then UTF-8. lexbor ignores <meta charset>
+    on bytes input and lxml assumes Latin-1 without one, so pages are decoded here before parsing
+    Returns the HTML as a string"""
+def decode_page(body: bytes, charset: str = None) -> str:
+    encoding = charset or EncodingDetector.find_declared_encoding(body, is_html=True) or 'utf-8'
+    try:
+        return body.decode(encoding, errors='replace')
+    except LookupError:
+        logger.warning(f"Unknown page encoding {encoding}, decoding as UTF-8")
+        return body.decode('utf-8', errors='replace')
+
+"""Asynchronously request a webpage
+    Requests are rate limited per host and retried with back-off on throttling, server errors,
+    connection errors, truncated bodies and timeouts
+    The body is decoded with decode_page, which skips aiohttp's charset detection
+    Returns a tuple of (status code, response headers, HTML content). The HTML content is an empty string
+    unless the status is 200, and the status is None if the page could not be fetched at all"""
+async def request_page(session, url, headers: dict = None) -> tuple:
+    limiter = get_host_limiter(url)
+
+    for attempt in range(MAX_RETRIES + 1):
+        response_headers = None
+        try:
+            async with limiter:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 200:
+                        html = decode_page(await response.read(), response.charset)
+                        return response.status, response.headers, html
+                    if response.status == 304:
+                        return response.status, response.headers, ""
+                    if response.status not in RETRY_STATUS_CODES:
+                        logger.error(f"Failed to fetch page: {url}, status code: {response.status}")
+                        return response.status, response.headers, ""
+                    response_headers = response.headers
+                    error = f"status code: {response.status}"
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+            error = repr(e)
+        except aiohttp.ClientError as e:
+            # Invalid URLs, redirect loops, malformed responses... retrying will not help
+            logger.error(f"Failed to fetch page: {url}, {e!r}")
+            return None, None, ""
+
+        if attempt < MAX_RETRIES:
+            delay = get_retry_delay(response_headers, attempt)
+            logger.warning(f"Retrying {url} in {delay:.1f}s ({error}), attempt {attempt + 1}/{MAX_RETRIES}")
+            await asyncio.sleep(delay)
+
+    logger.error(f"Failed to fetch page: {url} after {MAX_RETRIES} retries, {error}")
+    return None, response_headers, ""
 
 """Asynchronously get Webpages
-    Returns: The HTML content of webpage """
+    Returns: The HTML content of webpage, or an empty string if it could not be fetched"""
 async def fetch_page(session, url):
-    async with session.get(url) as response:
-        if response.status != 200:
-            logger.error(f"Failed to fetch page: {url}, status code: {response.status}")
-            return None
-        return await response.text()
+    _, _, html = await request_page(session, url)
+    return html
     
 """Asynchronously extract main product categories from the dropdown
     Returns a list of dictionaries where each dictionary contains the category name and its URL"""
 async def fetch_categories(base_url: str, selectors: dict, session) -> list:
     logger.info("Fetching main categories from the homepage...")
     html = await fetch_page(session, base_url)
-    if html is None:
+    if not html:
         logger.error("Failed to fetch categories.")
         return []
     
-    soup = BeautifulSoup(html, 'html.parser')
+    soup = BeautifulSoup(html, HTML_PARSER)
     
     categories = soup.select(selectors['category_container'])
     
+    # Resolve relative category links against the site root
+    base_url_norm = base_url if base_url.endswith('/') else base_url + '/'
     category_urls = []
     for category in categories:
         try:
             #if len(category_urls)<=1:
 
                 category_name = category.select_one('span').text.strip()
-                category_url = category.select_one('a')['href']
-                if not category_url.startswith('http'):
-                    category_url = os.path.join(base_url, category_url)
+                category_url = urljoin(base_url_norm, category.select_one('a')['href'])
 
                 category_urls.append({'name': category_name, 'url': category_url})
 
@@ -49,47 +188,89 @@ async def fetch_categories(base_url: str, selectors: dict, session) -> list:
 """Asynchronously scrape all categories and their products data
     Return a dictionary where 
     keys - category names
-    values - Pandas DataFrames with product data"""
-async def scrape_all_categories(base_url: str, selectors: dict) -> dict:
-    async with aiohttp.ClientSession() as session:
+    values - Pandas DataFrames with product data
+    rate_limit_config - per-host request rate, a dictionary with 'requests' per 'period' seconds
+    cache_file - optional sqlite file used to revalidate product pages across runs"""
+async def scrape_all_categories(base_url: str, selectors: dict, rate_limit_config: dict, cache_file: str = None) -> dict:
+    set_rate_limit(rate_limit_config['requests'], rate_limit_config['period'])
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONNECTIONS,
+        limit_per_host=MAX_CONNECTIONS_PER_HOST,
+        ttl_dns_cache=300,
+        keepalive_timeout=60,
+    )
+    async with aiohttp.ClientSession(connector=connector) as session:
         categories = await fetch_categories(base_url, selectors, session)
-        all_category_data = {}
+        cache = ProductCache(cache_file)
+        # One bounded pool of detail workers serves every category, so at most DETAIL_WORKERS
+        # product pages are in flight no matter how many products or categories there are
+        product_queue = asyncio.Queue(maxsize=PRODUCT_QUEUE_SIZE)
+        workers = [
+            asyncio.create_task(product_details_worker(product_queue, session, cache))
+            for _ in range(DETAIL_WORKERS)
+        ]
 
         for category in categories:
             logger.info(f"Scraping category: {category['name']}")
-            products_df = await scrape_data(category['url'], selectors)
-            all_category_data[category['name']] = products_df
-
-        return all_category_data
-
-"""Asynchronously scrape all the product data from each category page through pagination iteration"""
-async def scrape_listing_page(base_url: str, selectors: dict, session):
-    all_product_details = []
-    current_page_url = base_url
-    current_page = 1
 
-    while current_page_url:
-        logger.info(f"Scraping page {current_page}: {current_page_url}")
-
- 
-        html = await fetch_page(session, current_page_url)
-        if html is None:
-            break
-
-
-        soup = BeautifulSoup(html, 'html.parser')
-
-
-        products = soup.select(selectors['product_container'])
-        for product in products:
+        # Categories are scraped concurrently over the shared connection pool
+        try:
+            category_dfs = await asyncio.gather(
+                *[scrape_data(category['url'], selectors, session, product_queue) for category in categories]
+            )
+            await product_queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            cache.close()
+
+        return {category['name']: products_df for category, products_df in zip(categories, category_dfs)}
+
+"""Compile a CSS selector with soupsieve once and reuse it for every page"""
+@lru_cache(maxsize=None)
+def compile_selector(selector: str):
+    return sv.compile(selector)
+
+"""Build a SoupStrainer that keeps only the elements matched by the outermost part of each selector
+    e.g. "li.item.product.product-item" and "li.pages-item-next a" keep elements with the
+    product-item or pages-item-next class together with everything inside them.
+    Returns None (parse everything) if a selector has no class to strain on"""
+@lru_cache(maxsize=None)
+def build_strainer(*selectors: str):
+    classes = []
+    for selector in selectors:
+        if ',' in selector:
+            return None
+        outer_selector = re.split(r'[:\[>+~]', selector.split()[0])[0]
+        selector_classes = SELECTOR_CLASS_PATTERN.findall(outer_selector)
+        if not selector_classes:
+            return None
+        classes.append(selector_classes[-1])
+
+    return SoupStrainer(attrs={'class': has_any_class(*classes)})
+
+"""Extract product cards and the next page link from a category listing page
+    Uses selectolax (lexbor) when installed, otherwise falls back to BeautifulSoup
+    Returns a tuple of (list of product dictionaries, next page URL or None)"""
+def parse_listing_page(html, selectors: dict) -> tuple:
+    product_details = []
+    # selectors is usually an OmegaConf DictConfig, whose lookups are slow, so read it once per page
+    container_key = selectors['product_container']
+    title_key = selectors['product_title']
+    image_key = selectors['product_image']
+    next_page_key = selectors['next_page']
+
+    if LexborHTMLParser is not None:
+        tree = LexborHTMLParser(html)
+        for product in tree.css(container_key):
             try:
-                title_element = product.select_one(selectors['product_title'])
-                title = title_element.text.strip() if title_element else 'N/A'
-                image_element = product.select_one(selectors['product_image'])
-                image_url = image_element['src'] if image_element else 'N/A'
-                product_url = title_element['href'] if title_element else 'N/A'
+                title_element = product.css_first(title_key)
+                title = title_element.text().strip() if title_element else 'N/A'
+                image_element = product.css_first(image_key)
+                image_url = image_element.attributes['src'] if image_element else 'N/A'
+                product_url = title_element.attributes['href'] if title_element else 'N/A'
 
-                all_product_details.append({
+                product_details.append({
                     'Title': title,
                     'Image URL': image_url,
                     'Product URL': product_url
@@ -97,93 +278,311 @@ async def scrape_listing_page(base_url: str, selectors: dict, session):
             except Exception as e:
                 logger.warning(f"Error extracting data for a product: {e}")
 
-        logger.info(f"Scraped {len(products)} products from page {current_page}")
+        next_page_link = tree.css_first(next_page_key)
+        next_page_url = next_page_link.attributes.get('href') if next_page_link else None
+        return product_details, next_page_url
 
+    container_selector = compile_selector(container_key)
+    select_title = compile_selector(title_key).select_one
+    select_image = compile_selector(image_key).select_one
+    next_page_selector = compile_selector(next_page_key)
 
-        next_page_link = soup.select_one(selectors['next_page'])
-        if next_page_link:
-            current_page_url = next_page_link['href']
-            current_page += 1
-        else:
-            logger.info("No more pages found. Scraping completed.")
-            current_page_url = None  
+    strainer = build_strainer(container_key, next_page_key)
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=strainer)
+    for product in container_selector.select(soup):
+        try:
+            title_element = select_title(product)
+            title = title_element.text.strip() if title_element else 'N/A'
+            image_element = select_image(product)
+            image_url = image_element['src'] if image_element else 'N/A'
+            product_url = title_element['href'] if title_element else 'N/A'
+
+            product_details.append({
+                'Title': title,
+                'Image URL': image_url,
+                'Product URL': product_url
+            })
+        except Exception as e:
+            logger.warning(f"Error extracting data for a product: {e}")
 
-    return all_product_details
+    next_page_link = next_page_selector.select_one(soup)
+    next_page_url = next_page_link['href'] if next_page_link else None
+    return product_details, next_page_url
 
-"""Asynchronously scrape product details from each products page
-    Returns a dictionary containing the detailed information from individual product pages"""
-async def scrape_product_details(product_url: str, session) -> dict:
-    logger.info(f"Scraping product details from {product_url}")
-    
-    html = await fetch_page(session, product_url)
-    soup = BeautifulSoup(html, 'html.parser')
-   
+"""Extract the specification table from a product page
+    Uses selectolax (lexbor) when installed, otherwise falls back to BeautifulSoup
+    Returns a dictionary of header -> value, empty if no table was found"""
+def parse_product_table(html) -> dict:
     product_data = {}
-    table = soup.find('table', class_='table table-bordered mt-3')
 
-    if table:
-        
-        rows = table.find_all('tr')
-        for row in rows:
-            columns = row.find_all('td')
+    if LexborHTMLParser is not None:
+        tree = LexborHTMLParser(html)
+        for row in tree.css(PRODUCT_TABLE_ROW_SELECTOR):
+            columns = row.css('td')
             if len(columns) == 2:
-                
-                header_text = columns[0].get_text(strip=True).replace(':', '')
-                value_text = columns[1].get_text(strip=True)
+                header_text = columns[0].text(strip=True).replace(':', '')
+                value_text = columns[1].text(strip=True)
                 product_data[header_text] = value_text
-    else:
-        logger.warning(f"No product details table found for {product_url}")
+        return product_data
+
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=PRODUCT_TABLE_STRAINER)
+    for row in compile_selector(PRODUCT_TABLE_ROW_SELECTOR).select(soup):
+        columns = row.find_all('td')
+        if len(columns) == 2:
+            header_text = columns[0].get_text(strip=True).replace(':', '')
+            value_text = columns[1].get_text(strip=True)
+            product_data[header_text] = value_text
 
     return product_data
 
+"""Parse one listing page and log how many products it held
+    Relative product, image and next page links are resolved against the page URL
+    Returns a tuple of (list of product dictionaries, next page URL or None)"""
+def scrape_page_products(html, page_number: int, page_url: str, selectors: dict) -> tuple:
+    products, next_page_url = parse_listing_page(html, selectors)
+    for product in products:
+        for key in ('Product URL', 'Image URL'):
+            if product[key] and product[key] != 'N/A':
+                product[key] = urljoin(page_url, product[key])
+    if next_page_url:
+        next_page_url = urljoin(page_url, next_page_url)
+
+    logger.info(f"Scraped {len(products)} products from page {page_number}")
+    return products, next_page_url
+
+"""Asynchronously scrape all the product data from each category page through pagination iteration
+    Async generator yielding product dictionaries as soon as their page is parsed, so detail
+    fetches can start before pagination finishes.
+    If the next page link carries a page number (?p=N / ?page=N) pages are fetched
+    PAGINATION_WINDOW at a time, otherwise the next page links are followed one by one."""
+async def scrape_listing_page(base_url: str, selectors: dict, session):
+    logger.info(f"Scraping page 1: {base_url}")
+    html = await fetch_page(session, base_url)
+    if not html:
+        return
+
+    products, next_page_url = scrape_page_products(html, 1, base_url, selectors)
+    for product in products:
+        yield product
+
+    current_page = 2
+    page_match = PAGE_NUMBER_PATTERN.search(next_page_url) if next_page_url else None
+
+    if page_match:
+        url_template = next_page_url
+        current_page = int(page_match.group(2))
+
+        while next_page_url:
+            page_numbers = range(current_page, current_page + PAGINATION_WINDOW)
+            page_urls = [
+                PAGE_NUMBER_PATTERN.sub(lambda m: f"{m.group(1)}{page_number}", url_template, count=1)
+                for page_number in page_numbers
+            ]
+            logger.info(f"Scraping pages {page_numbers[0]}-{page_numbers[-1]}")
+            fetches = [asyncio.create_task(fetch_page(session, page_url)) for page_url in page_urls]
+
+            # Pages are parsed in order as soon as they arrive. Stop at the first page without a next link
+            # or the first failed page, like the serial walk does, and cancel the fetches still running
+            next_page_url = None
+            try:
+                for page_number, page_url, fetch in zip(page_numbers, page_urls, fetches):
+                    html = await fetch
+                    if not html:
+                        next_page_url = None
+                        break
+                    products, next_page_url = scrape_page_products(html, page_number, page_url, selectors)
+                    for product in products:
+                        yield product
+                    if not next_page_url:
+                        break
+            finally:
+                for fetch in fetches:
+                    fetch.cancel()
+
+            current_page += PAGINATION_WINDOW
+    else:
+        while next_page_url:
+            logger.info(f"Scraping page {current_page}: {next_page_url}")
+            html = await fetch_page(session, next_page_url)
+            if not html:
+                break
+
+            products, next_page_url = scrape_page_products(html, current_page, next_page_url, selectors)
+            for product in products:
+                yield product
+            current_page += 1
 
-"""Scrape product data from category listing page and product detail pages asynchronously.
-    Returns pd.DataFrame"""
-async def scrape_data(base_url: str, selectors: dict) -> pd.DataFrame:
-    async with aiohttp.ClientSession() as session:
-        product_details_list = await scrape_listing_page(base_url, selectors, session)
-        all_products_data = []
+    logger.info("No more pages found. Scraping completed.")
 
+"""Asynchronously scrape product details from each products page
+    If details for the page were stored by an earlier run they are revalidated with
+    If-None-Match and reused when the page has not changed
+    Returns a dictionary containing the detailed information from individual product pages"""
+async def fetch_product_details(product_url: str, session, cache: ProductCache) -> dict:
+    logger.info(f"Scraping product details from {product_url}")
 
-        tasks = []
-        for product in product_details_list:
-            tasks.append(scrape_product_details(product['Product URL'], session))
+    etag, stored_data = cache.get_stored(product_url)
+    headers = {'If-None-Match': etag} if etag else None
+    status, response_headers, html = await request_page(session, product_url, headers)
+    if status == 304:
+        logger.info(f"Product page unchanged, reusing stored details for {product_url}")
+        return stored_data
+    if not html:
+        return {}
+
+    product_data = parse_product_table(html)
+    if not product_data:
+        logger.warning(f"No product details table found for {product_url}")
+    else:
+        cache.store(product_url, response_headers.get('ETag'), product_data)
 
-        product_details = await asyncio.gather(*tasks)
+    return product_data
 
+"""Scrape product details once per product URL
+    Products seen again in this run (cross-listed categories, repeated listings) await the
+    future of the first scrape instead of fetching the page again"""
+async def scrape_product_details(product_url: str, session, cache: ProductCache) -> dict:
+    if product_url in cache.tasks:
+        logger.info(f"Already scraped {product_url}, reusing details")
+        return await cache.tasks[product_url]
 
-        for product, details in zip(product_details_list, product_details):
-            if details:
-                details.update({
-                    'Title': product['Title'],
-                    'Image URL': product['Image URL'],
-                    'Product URL': product['Product URL']
-                })
-                all_products_data.append(details)
-            else:
-                logger.warning(f"Skipping {product['Title']} as no details were extracted.")
+    future = asyncio.get_running_loop().create_future()
+    cache.tasks[product_url] = future
+    try:
+        product_data = await fetch_product_details(product_url, session, cache)
+    except Exception:
+        # Duplicates get no details, the same as the worker that hit the error
+        future.set_result({})
+        raise
+    future.set_result(product_data)
+    return product_data
 
-        df = pd.DataFrame(all_products_data)
-        logger.info(f"Scraping completed. Extracted data for {len(df)} products.")
-        return df
 
+"""Worker pulling (results queue, index, product) items off the shared product queue
+    Puts (index, product, details) on the results queue of the category the product came from"""
+async def product_details_worker(product_queue: asyncio.Queue, session, cache: ProductCache):
+    while True:
+        results_queue, index, product = await product_queue.get()
+        try:
+            details = await scrape_product_details(product['Product URL'], session, cache)
+        except Exception as e:
+            logger.error(f"Error scraping product details for {product['Product URL']}: {e}")
+            details = {}
+        finally:
+            product_queue.task_done()
+        results_queue.put_nowait((index, product, details))
 
-"""Save data to an Excel file with multiple sheets """
-def save_to_excel_multiple_sheets(category_data: dict, file_path: str):
+"""Scrape product data from category listing page and product detail pages asynchronously.
+    Listed products are put on the shared bounded product queue as soon as their listing page is
+    parsed, so product pages are fetched by the worker pool while pagination is still running.
+    Returns pd.DataFrame"""
+async def scrape_data(base_url: str, selectors: dict, session, product_queue: asyncio.Queue) -> pd.DataFrame:
+    results_queue = asyncio.Queue()
+
+    product_count = 0
+    async for product in scrape_listing_page(base_url, selectors, session):
+        await product_queue.put((results_queue, product_count, product))
+        product_count += 1
+
+    results = [await results_queue.get() for _ in range(product_count)]
+
+    # Workers finish out of order, restore the listing order before building the DataFrame
+    results.sort(key=lambda result: result[0])
+    detail_dicts = []
+    titles = []
+    image_urls = []
+    product_urls = []
+
+    for _, product, details in results:
+        if details:
+            detail_dicts.append(details)
+            titles.append(product['Title'])
+            image_urls.append(product['Image URL'])
+            product_urls.append(product['Product URL'])
+        else:
+            logger.warning(f"Skipping {product['Title']} as no details were extracted.")
+
+    # Listing columns are added column-wise instead of merged into every details dict
+    df = pd.DataFrame(detail_dicts)
+    df['Title'] = titles
+    df['Image URL'] = image_urls
+    df['Product URL'] = product_urls
+    logger.info(f"Scraping completed. Extracted data for {len(df)} products.")
+    return df
+
+
+"""Missing product details are NaN in pandas, replace them with None so they are written as empty cells"""
+def fill_missing(data: pd.DataFrame) -> pd.DataFrame:
+    return data.astype(object).where(data.notna(), None)
+
+"""Yield (sheet name, DataFrame) for every category with products
+    Sheet names are cut to Excel's 31 character limit"""
+def iter_sheets(category_data: dict):
+    for category, data in category_data.items():
+        if not data.empty:
+
+            sheet_name = category[:31]
+            logger.info(f"Writing data for category: {sheet_name}")
+            yield sheet_name, data
+
+"""Write each category DataFrame to its own sheet with pyexcelerate in one bulk call per sheet"""
+def write_excel_pyexcelerate(category_data: dict, file_path: str):
+    workbook = Workbook()
+    sheet_count = 0
+    for sheet_name, data in iter_sheets(category_data):
+        values = fill_missing(data).values.tolist()
+        workbook.new_sheet(sheet_name, data=[data.columns.tolist()] + values)
+        sheet_count += 1
+
+    # pyexcelerate refuses to save a workbook without sheets, write an empty one like xlsxwriter does
+    if sheet_count == 0:
+        logger.warning("No category has any products, writing an empty workbook.")
+        workbook.new_sheet('Sheet1')
+    workbook.save(file_path)
+
+"""Write each category DataFrame to its own sheet with xlsxwriter
+    constant_memory mode flushes each row to disk once a later row is started, so rows are
+    written one at a time in order (DataFrame.to_excel writes column by column and would lose data)"""
+def write_excel_xlsxwriter(category_data: dict, file_path: str):
+    with xlsxwriter.Workbook(file_path, {'constant_memory': True}) as workbook:
+        for sheet_name, data in iter_sheets(category_data):
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, data.columns.tolist())
+            for row_number, row in enumerate(fill_missing(data).values.tolist(), start=1):
+                worksheet.write_row(row_number, 0, row)
+
+"""Write each category DataFrame to its own sheet with an openpyxl write-only workbook
+    Rows are streamed straight into the sheet without building styled cells"""
+def write_excel_openpyxl(category_data: dict, file_path: str):
+    workbook = openpyxl.Workbook(write_only=True)
+    for sheet_name, data in iter_sheets(category_data):
+        worksheet = workbook.create_sheet(title=sheet_name)
+        for row in dataframe_to_rows(fill_missing(data), index=False, header=True):
+            worksheet.append(row)
+    workbook.save(file_path)
+
+EXCEL_WRITERS = {
+    'pyexcelerate': write_excel_pyexcelerate,
+    'xlsxwriter': write_excel_xlsxwriter,
+    'openpyxl': write_excel_openpyxl,
+}
+
+"""Asynchronously save data to an Excel file with multiple sheets
+    The workbook is written in a thread executor so serialisation does not block the event loop
+    engine selects the writer, one of EXCEL_WRITERS ('pyexcelerate', 'xlsxwriter' or 'openpyxl')"""
+async def save_to_excel_multiple_sheets(category_data: dict, file_path: str, engine: str = 'pyexcelerate'):
     
     output_dir = os.path.join(os.getcwd(), os.path.dirname(file_path))
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         logger.info(f"Created directory: {output_dir}")
 
-    try:
-        with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
-            for category, data in category_data.items():
-                if not data.empty:
+    if engine not in EXCEL_WRITERS:
+        raise ValueError(f"Unknown Excel engine: {engine}, expected one of {list(EXCEL_WRITERS)}")
 
-                    sheet_name = category[:31]
-                    logger.info(f"Writing data for category: {sheet_name}")
-                    data.to_excel(writer, sheet_name=sheet_name, index=False)
+    try:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, EXCEL_WRITERS[engine], category_data, file_path)
         logger.info(f"Data saved to {file_path} with {len(category_data)} sheets.")
     except Exception as e:
         logger.error(f"Error saving data to Excel: {e}")
@@ -0,0 +1,52 @@
+import json
+import os
+import sqlite3
+from loguru import logger
+
+
+"""Product details cache shared by every category scrape
+    tasks - in-flight and finished detail scrapes keyed by product URL, so a product listed in
+            several categories or on several pages is only fetched once per run
+    The optional sqlite database keeps product details with the ETag of the page they were
+    parsed from, so later runs can revalidate with If-None-Match and skip re-parsing unchanged pages"""
+class ProductCache:
+    def __init__(self, db_path: str = None):
+        self.tasks = {}
+        self.connection = None
+
+        if db_path:
+            db_dir = os.path.dirname(db_path)
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir)
+                logger.info(f"Created directory: {db_dir}")
+
+            self.connection = sqlite3.connect(db_path)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS product_cache (url TEXT PRIMARY KEY, etag TEXT NOT NULL, data TEXT NOT NULL)"
+            )
+
+    """Returns a tuple of (etag, product data) stored for the URL, or (None, None) if there is none"""
+    def get_stored(self, url: str) -> tuple:
+        if self.connection is None:
+            return None, None
+
+        row = self.connection.execute("SELECT etag, data FROM product_cache WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None, None
+        return row[0], json.loads(row[1])
+
+    """Store the product data parsed from the page with the given ETag"""
+    def store(self, url: str, etag: str, product_data: dict):
+        if self.connection is None or not etag:
+            return
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO product_cache (url, etag, data) VALUES (?, ?, ?)",
+            (url, etag, json.dumps(product_data)),
+        )
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
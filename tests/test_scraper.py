@@ -0,0 +1,433 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiohttp
+from aiohttp import web
+import numpy as np
+import pandas as pd
+import pytest
+
+from product_scraper_poc import scraper
+from product_scraper_poc.utils import ProductCache
+
+
+SELECTORS = {
+    'category_container': "li.level1.category-item.parent",
+    'product_container': "li.item.product.product-item",
+    'product_title': "a.product-item-link",
+    'product_image': "img.product-image-photo",
+    'next_page': "li.pages-item-next a",
+}
+
+LISTING_HTML = """
+<html><body>
+<ul class="products">
+  <li class="item product product-item">
+    <a class="product-item-link" href="/apple-iphone-15-pro"> Apple iPhone <span>15</span> Pro </a>
+    <img class="product-image-photo" src="/images/iphone.jpg">
+  </li>
+  <li class="item product product-item">
+    <a class="product-item-link" href="/pixel-8">Google Pixel 8</a>
+    <img class="product-image-photo" src="/images/pixel.jpg">
+  </li>
+</ul>
+<ul class="pages"><li class="item pages-item-next"><a href="/phones?p=2">Next</a></li></ul>
+</body></html>
+"""
+
+
+def test_parse_listing_page_keeps_spaces_in_titles():
+    products, next_page_url = scraper.parse_listing_page(LISTING_HTML, SELECTORS)
+
+    assert [product['Title'] for product in products] == ['Apple iPhone 15 Pro', 'Google Pixel 8']
+    assert products[0]['Product URL'] == '/apple-iphone-15-pro'
+    assert products[0]['Image URL'] == '/images/iphone.jpg'
+    assert next_page_url == '/phones?p=2'
+
+
+def make_listing_page(page_number: int, last_page: int) -> str:
+    next_link = f'<li class="pages-item-next"><a href="/phones?p={page_number + 1}">Next</a></li>' if page_number < last_page else ''
+    return f"""
+    <ul>
+      <li class="item product product-item">
+        <a class="product-item-link" href="/product-{page_number}">Product {page_number}</a>
+        <img class="product-image-photo" src="/images/{page_number}.jpg">
+      </li>
+    </ul>
+    <ul class="pages">{next_link}</ul>
+    """
+
+
+async def collect_listing(base_url: str) -> list:
+    return [product async for product in scraper.scrape_listing_page(base_url, SELECTORS, session=None)]
+
+
+def test_scrape_listing_page_stops_at_failed_page_in_window(monkeypatch):
+    fetched = []
+
+    async def fake_fetch_page(session, url):
+        fetched.append(url)
+        page_number = int(url.split('?p=')[1]) if '?p=' in url else 1
+        if page_number == 3:
+            return ""
+        return make_listing_page(page_number, last_page=10)
+
+    monkeypatch.setattr(scraper, 'fetch_page', fake_fetch_page)
+    products = asyncio.run(collect_listing('https://example.com/phones'))
+
+    assert [product['Title'] for product in products] == ['Product 1', 'Product 2']
+    assert len(fetched) == 1 + scraper.PAGINATION_WINDOW
+
+
+def test_scrape_listing_page_cancels_fetches_past_last_page(monkeypatch):
+    cancelled = []
+
+    async def fake_fetch_page(session, url):
+        page_number = int(url.split('?p=')[1]) if '?p=' in url else 1
+        if page_number > 2:
+            # Pages past the last one keep retrying until they are cancelled
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                cancelled.append(page_number)
+                raise
+        return make_listing_page(page_number, last_page=2)
+
+    async def collect_and_settle():
+        products = await asyncio.wait_for(collect_listing('https://example.com/phones'), timeout=5)
+        await asyncio.sleep(0)
+        return products, sorted(cancelled)
+
+    monkeypatch.setattr(scraper, 'fetch_page', fake_fetch_page)
+    products, cancelled_pages = asyncio.run(collect_and_settle())
+
+    assert [product['Title'] for product in products] == ['Product 1', 'Product 2']
+    assert cancelled_pages == list(range(3, 2 + scraper.PAGINATION_WINDOW))
+
+
+def test_scrape_listing_page_walks_all_numbered_pages(monkeypatch):
+    async def fake_fetch_page(session, url):
+        page_number = int(url.split('?p=')[1]) if '?p=' in url else 1
+        # Pages past the last one repeat the last page, like Magento does
+        return make_listing_page(min(page_number, 6), last_page=6)
+
+    monkeypatch.setattr(scraper, 'fetch_page', fake_fetch_page)
+    products = asyncio.run(collect_listing('https://example.com/phones'))
+
+    assert [product['Title'] for product in products] == [f'Product {n}' for n in range(1, 7)]
+    assert products[0]['Product URL'] == 'https://example.com/product-1'
+
+
+async def request_with_session(url: str) -> tuple:
+    async with aiohttp.ClientSession() as session:
+        return await scraper.request_page(session, url)
+
+
+def test_request_page_does_not_retry_invalid_urls(monkeypatch):
+    delays = []
+    monkeypatch.setattr(scraper, 'get_retry_delay', lambda headers, attempt: delays.append(attempt) or 0)
+
+    status, _, html = asyncio.run(request_with_session('N/A'))
+
+    assert status is None and html == ""
+    assert delays == []
+
+
+def test_request_page_retries_connection_errors(monkeypatch):
+    delays = []
+    monkeypatch.setattr(scraper, 'get_retry_delay', lambda headers, attempt: delays.append(attempt) or 0)
+
+    # Nothing listens on port 1, so every attempt is refused
+    status, _, html = asyncio.run(request_with_session('http://127.0.0.1:1/'))
+
+    assert status is None and html == ""
+    assert delays == list(range(scraper.MAX_RETRIES))
+
+
+class TruncatedOnceSession:
+    """Session whose first response body is cut short, the next one is complete"""
+    def __init__(self):
+        self.attempts = 0
+        self.status = 200
+        self.headers = {}
+        self.charset = 'utf-8'
+
+    def get(self, url, headers=None):
+        self.attempts += 1
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def read(self):
+        if self.attempts == 1:
+            raise aiohttp.ClientPayloadError("Response payload is not completed")
+        return b'<p>complete</p>'
+
+
+def test_request_page_retries_truncated_bodies(monkeypatch):
+    monkeypatch.setattr(scraper, 'get_retry_delay', lambda headers, attempt: 0)
+    session = TruncatedOnceSession()
+
+    status, _, html = asyncio.run(scraper.request_page(session, 'https://example.com/'))
+
+    assert status == 200 and html == '<p>complete</p>'
+    assert session.attempts == 2
+
+
+def test_set_rate_limit_rebuilds_host_limiters(monkeypatch):
+    monkeypatch.setattr(scraper, 'rate_limit', {'requests': 20, 'period': 1})
+    monkeypatch.setattr(scraper, 'host_limiters', {})
+
+    scraper.get_host_limiter('https://example.com/a')
+    scraper.set_rate_limit(5, 2)
+    limiter = scraper.get_host_limiter('https://example.com/b')
+
+    assert limiter.max_rate == 5 and limiter.time_period == 2
+
+
+PRODUCT_HTML = """
+<html><body>
+<nav><table class="table-bordered"><tr><td>Menu:</td><td>Phones</td></tr></table></nav>
+<table class="table table-bordered mt-3">
+  <tr><td>Brand:</td><td>Apple</td></tr>
+  <tr><td>Price:</td><td>£999</td></tr>
+  <tr><td colspan="2">Specifications</td></tr>
+</table>
+</body></html>
+"""
+
+
+def test_beautifulsoup_fallback_parses_listing_page(monkeypatch):
+    monkeypatch.setattr(scraper, 'LexborHTMLParser', None)
+
+    products, next_page_url = scraper.parse_listing_page(LISTING_HTML, SELECTORS)
+
+    assert [product['Title'] for product in products] == ['Apple iPhone 15 Pro', 'Google Pixel 8']
+    assert products[1]['Image URL'] == '/images/pixel.jpg'
+    assert next_page_url == '/phones?p=2'
+
+
+def test_parse_product_table():
+    assert scraper.parse_product_table(PRODUCT_HTML) == {'Brand': 'Apple', 'Price': '£999'}
+
+
+def test_beautifulsoup_fallback_parses_product_table(monkeypatch):
+    monkeypatch.setattr(scraper, 'LexborHTMLParser', None)
+
+    assert scraper.parse_product_table(PRODUCT_HTML) == {'Brand': 'Apple', 'Price': '£999'}
+
+
+@pytest.mark.parametrize('engine', sorted(scraper.EXCEL_WRITERS))
+def test_save_to_excel_with_only_empty_categories(tmp_path, engine):
+    file_path = str(tmp_path / 'products.xlsx')
+
+    asyncio.run(scraper.save_to_excel_multiple_sheets({'Phones': pd.DataFrame()}, file_path, engine))
+
+    sheets = pd.read_excel(file_path, sheet_name=None)
+    assert len(sheets) == 1
+    assert all(sheet.empty for sheet in sheets.values())
+
+
+@pytest.mark.parametrize('engine', sorted(scraper.EXCEL_WRITERS))
+def test_save_to_excel_round_trip(tmp_path, engine):
+    file_path = str(tmp_path / 'products.xlsx')
+    phones = pd.DataFrame({
+        'Brand': ['Apple', 'Google', 'Samsung'],
+        'Colour': ['Black', np.nan, 'Green'],
+        'Title': ['iPhone 15', 'Pixel 8', 'Galaxy S24'],
+    })
+    tablets = pd.DataFrame({'Brand': ['Apple'], 'Title': ['iPad']})
+
+    asyncio.run(scraper.save_to_excel_multiple_sheets({'Phones': phones, 'Tablets': tablets}, file_path, engine))
+
+    sheets = pd.read_excel(file_path, sheet_name=None)
+    assert list(sheets) == ['Phones', 'Tablets']
+    pd.testing.assert_frame_equal(sheets['Phones'], phones)
+    pd.testing.assert_frame_equal(sheets['Tablets'], tablets)
+
+
+def test_decode_page_uses_content_type_charset():
+    body = '<p>£5 café</p>'.encode('latin-1')
+
+    assert scraper.decode_page(body, 'iso-8859-1') == '<p>£5 café</p>'
+
+
+def test_decode_page_falls_back_to_meta_charset_then_utf8():
+    latin1_body = '<meta charset="iso-8859-1"><p>£5 café</p>'.encode('latin-1')
+    utf8_body = '<p>£5 – café</p>'.encode('utf-8')
+
+    assert scraper.decode_page(latin1_body) == '<meta charset="iso-8859-1"><p>£5 café</p>'
+    assert scraper.decode_page(utf8_body) == '<p>£5 – café</p>'
+
+
+def test_decoded_page_keeps_pound_sign_in_product_table():
+    body = PRODUCT_HTML.replace('<html>', '<html><head><meta charset="iso-8859-1"></head>').encode('latin-1')
+
+    assert scraper.parse_product_table(scraper.decode_page(body))['Price'] == '£999'
+
+
+@asynccontextmanager
+async def serve(app: web.Application):
+    """Run the app on a free local port and yield its base URL"""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        await runner.cleanup()
+
+
+def test_request_page_decodes_with_response_charset():
+    async def serve_and_request():
+        async def handler(request):
+            body = '<p>£5 café</p>'.encode('latin-1')
+            return web.Response(body=body, headers={'Content-Type': 'text/html; charset=iso-8859-1'})
+
+        app = web.Application()
+        app.router.add_get('/', handler)
+        async with serve(app) as base_url:
+            return await request_with_session(f'{base_url}/')
+
+    status, _, html = asyncio.run(serve_and_request())
+
+    assert status == 200
+    assert html == '<p>£5 café</p>'
+
+
+def product_page(brand: str) -> str:
+    return f'<table class="table table-bordered mt-3"><tr><td>Brand:</td><td>{brand}</td></tr></table>'
+
+
+def make_product_app(hits: dict) -> web.Application:
+    """Product pages at /<brand>, /etag/<brand> also sends an ETag and answers If-None-Match with 304"""
+    async def handler(request):
+        brand = request.match_info['brand']
+        hits[request.path] = hits.get(request.path, 0) + 1
+        return web.Response(text=product_page(brand), content_type='text/html')
+
+    async def etag_handler(request):
+        hits[request.path] = hits.get(request.path, 0) + 1
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304, headers={'ETag': '"v1"'})
+        return web.Response(text=product_page(request.match_info['brand']), content_type='text/html', headers={'ETag': '"v1"'})
+
+    app = web.Application()
+    app.router.add_get('/etag/{brand}', etag_handler)
+    app.router.add_get('/{brand}', handler)
+    return app
+
+
+def test_scrape_product_details_fetches_each_url_once():
+    hits = {}
+
+    async def scrape_repeatedly():
+        async with serve(make_product_app(hits)) as base_url, aiohttp.ClientSession() as session:
+            cache = ProductCache()
+            return await asyncio.gather(
+                *[scraper.scrape_product_details(f'{base_url}/Apple', session, cache) for _ in range(3)]
+            )
+
+    results = asyncio.run(scrape_repeatedly())
+
+    assert results == [{'Brand': 'Apple'}] * 3
+    assert hits == {'/Apple': 1}
+
+
+def test_fetch_product_details_reuses_stored_details_when_not_modified(tmp_path):
+    hits = {}
+
+    async def revalidate():
+        cache = ProductCache(str(tmp_path / 'cache.sqlite'))
+        async with serve(make_product_app(hits)) as base_url, aiohttp.ClientSession() as session:
+            product_url = f'{base_url}/etag/Apple'
+            cache.store(product_url, '"v1"', {'Brand': 'Stored'})
+            details = await scraper.fetch_product_details(product_url, session, cache)
+        cache.close()
+        return details
+
+    assert asyncio.run(revalidate()) == {'Brand': 'Stored'}
+    assert hits == {'/etag/Apple': 1}
+
+
+def test_fetch_product_details_stores_only_pages_with_etag(tmp_path):
+    async def fetch_both():
+        cache = ProductCache(str(tmp_path / 'cache.sqlite'))
+        async with serve(make_product_app({})) as base_url, aiohttp.ClientSession() as session:
+            tagged_url = f'{base_url}/etag/Apple'
+            untagged_url = f'{base_url}/Google'
+            await scraper.fetch_product_details(tagged_url, session, cache)
+            await scraper.fetch_product_details(untagged_url, session, cache)
+            stored = cache.get_stored(tagged_url), cache.get_stored(untagged_url)
+        cache.close()
+        return stored
+
+    tagged, untagged = asyncio.run(fetch_both())
+
+    assert tagged == ('"v1"', {'Brand': 'Apple'})
+    assert untagged == (None, None)
+
+
+def make_category_page(slugs: list) -> str:
+    items = ''.join(
+        f'<li class="item product product-item"><a class="product-item-link" href="/products/{slug}">{slug.title()}</a>'
+        f'<img class="product-image-photo" src="/images/{slug}.jpg"></li>'
+        for slug in slugs
+    )
+    return f'<html><body><ul>{items}</ul></body></html>'
+
+
+def test_scrape_all_categories_keeps_listing_order_and_shares_product_pages(monkeypatch):
+    categories = {'phones': ['slow', 'shared', 'broken', 'pixel'], 'tablets': ['shared', 'ipad']}
+    hits = {}
+
+    async def home(request):
+        items = ''.join(
+            f'<li class="level1 category-item parent"><a href="/{name}"><span>{name.title()}</span></a></li>'
+            for name in categories
+        )
+        return web.Response(text=f'<html><body><ul>{items}</ul></body></html>', content_type='text/html')
+
+    async def category(request):
+        return web.Response(text=make_category_page(categories[request.match_info['name']]), content_type='text/html')
+
+    async def product(request):
+        slug = request.match_info['slug']
+        hits[slug] = hits.get(slug, 0) + 1
+        if slug == 'slow':
+            # Finishes after the products listed behind it
+            await asyncio.sleep(0.2)
+        return web.Response(text=product_page(slug.title()), content_type='text/html')
+
+    parse_product_table = scraper.parse_product_table
+
+    def failing_parse_product_table(html):
+        if 'Broken' in html:
+            raise ValueError("unexpected product table")
+        return parse_product_table(html)
+
+    monkeypatch.setattr(scraper, 'parse_product_table', failing_parse_product_table)
+
+    app = web.Application()
+    app.router.add_get('/', home)
+    app.router.add_get('/products/{slug}', product)
+    app.router.add_get('/{name}', category)
+
+    async def scrape_site():
+        async with serve(app) as base_url:
+            return await scraper.scrape_all_categories(base_url, SELECTORS, {'requests': 1000, 'period': 1})
+
+    category_data = asyncio.run(scrape_site())
+
+    assert list(category_data) == ['Phones', 'Tablets']
+    assert category_data['Phones']['Title'].tolist() == ['Slow', 'Shared', 'Pixel']
+    assert category_data['Phones']['Brand'].tolist() == ['Slow', 'Shared', 'Pixel']
+    assert category_data['Tablets']['Title'].tolist() == ['Shared', 'Ipad']
+    assert [url.rsplit('/', 1)[1] for url in category_data['Tablets']['Product URL']] == ['shared', 'ipad']
+    assert hits == {'slow': 1, 'shared': 1, 'broken': 1, 'pixel': 1, 'ipad': 1}